@@ -4,6 +4,7 @@ Uses PostgreSQL via psycopg2 with a connection pool.
 """
 import os
 import json
+import threading
 from datetime import datetime, timedelta
 
 import psycopg2
@@ -11,13 +12,19 @@ import psycopg2.extras
 import psycopg2.pool
 
 _pool = None
+# getconn() raises PoolError the instant the pool is empty; this gate makes
+# callers queue for a connection instead. The web server runs handlers on a
+# 100-token thread pool, so bursts can easily outnumber the connections.
+_pool_gate = None
 
 
 def _get_pool():
-    global _pool
+    global _pool, _pool_gate
     if _pool is None:
         dsn = os.getenv("DATABASE_URL", "")
-        _pool = psycopg2.pool.ThreadedConnectionPool(minconn=2, maxconn=10, dsn=dsn)
+        maxconn = int(os.getenv("DB_POOL_MAX", "10"))
+        _pool = psycopg2.pool.ThreadedConnectionPool(minconn=2, maxconn=maxconn, dsn=dsn)
+        _pool_gate = threading.BoundedSemaphore(maxconn)
     return _pool
 
 
@@ -37,11 +44,21 @@ class _Conn:
         self._raw.rollback()
 
     def close(self):
+        if self._raw is None:
+            return
         _get_pool().putconn(self._raw)
+        self._raw = None
+        _pool_gate.release()
 
 
 def get_connection():
-    return _Conn(_get_pool().getconn())
+    pool = _get_pool()
+    _pool_gate.acquire()
+    try:
+        return _Conn(pool.getconn())
+    except Exception:
+        _pool_gate.release()
+        raise
 
 
 def _to_dt(val):
@@ -170,6 +187,14 @@ def migrate():
         )
     """)
 
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            cache_key TEXT PRIMARY KEY,
+            answer TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
     c.execute("""
         CREATE TABLE IF NOT EXISTS subscriptions (
             id SERIAL PRIMARY KEY,
@@ -383,6 +408,59 @@ def get_session_responses(session_id):
     return [dict(r) for r in rows]
 
 
+def get_session_with_responses(session_id):
+    """Session row plus its responses in a single JOINed query."""
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "SELECT s.*, r.id AS r_id, r.question_text, r.transcription, "
+        "r.duration AS r_duration, r.part AS r_part "
+        "FROM sessions s LEFT JOIN responses r ON r.session_id = s.id "
+        "WHERE s.id = %s ORDER BY r.id",
+        (session_id,)
+    )
+    rows = c.fetchall()
+    conn.close()
+    if not rows:
+        return None
+    session = {k: v for k, v in dict(rows[0]).items()
+               if k not in ("r_id", "question_text", "transcription", "r_duration", "r_part")}
+    session["responses"] = [
+        {
+            "id": r["r_id"],
+            "question_text": r["question_text"],
+            "transcription": r["transcription"],
+            "duration": r["r_duration"],
+            "part": r["r_part"],
+        }
+        for r in rows if r["r_id"] is not None
+    ]
+    return session
+
+
+# ─── AI answer cache ───────────────────────────────────────────
+
+def get_cached_answer(cache_key):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT answer FROM ai_cache WHERE cache_key = %s", (cache_key,))
+    row = c.fetchone()
+    conn.close()
+    return row["answer"] if row else None
+
+
+def put_cached_answer(cache_key, answer):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO ai_cache (cache_key, answer) VALUES (%s, %s) "
+        "ON CONFLICT (cache_key) DO NOTHING",
+        (cache_key, answer)
+    )
+    conn.commit()
+    conn.close()
+
+
 # ─── Progress helpers ──────────────────────────────────────────
 
 def get_weekly_progress(user_id):
@@ -523,6 +601,44 @@ def get_average_score(user_id, limit=10):
     return round(row["avg_score"], 1) if row and row["avg_score"] else None
 
 
+def get_user_dashboard(user_id):
+    """Settings plus the dashboard aggregates in a single query.
+
+    Collapses the get_user_settings + get_total_sessions +
+    get_total_practice_hours + get_average_score fan-out into one
+    round-trip for the /api/user/me and /api/progress/streak endpoints.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("INSERT INTO user_settings (user_id) VALUES (%s) ON CONFLICT DO NOTHING", (user_id,))
+    conn.commit()
+    c.execute(
+        """SELECT us.*,
+               (SELECT COUNT(*) FROM sessions
+                WHERE user_id=%s AND status='completed') AS _total_sessions,
+               (SELECT COALESCE(SUM(minutes), 0) FROM daily_study
+                WHERE user_id=%s) AS _total_minutes,
+               (SELECT AVG(score_overall) FROM (
+                   SELECT score_overall FROM sessions
+                   WHERE user_id=%s AND status='completed' AND score_overall IS NOT NULL
+                   ORDER BY completed_at DESC LIMIT 10
+               ) sub) AS _avg_score
+           FROM user_settings us WHERE us.user_id=%s""",
+        (user_id, user_id, user_id, user_id)
+    )
+    row = dict(c.fetchone())
+    conn.close()
+    total_sessions = row.pop("_total_sessions")
+    total_minutes = row.pop("_total_minutes")
+    avg_score = row.pop("_avg_score")
+    return {
+        "settings": row,
+        "total_sessions": total_sessions,
+        "total_hours": round(total_minutes / 60, 1),
+        "average_score": round(avg_score, 1) if avg_score else None,
+    }
+
+
 def get_total_practice_hours(user_id):
     conn = get_connection()
     c = conn.cursor()
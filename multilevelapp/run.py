@@ -7,7 +7,6 @@ import asyncio
 import logging
 import threading
 import time
-import runpy
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -22,6 +21,18 @@ console = logging.StreamHandler()
 console.setLevel(logging.INFO)
 logging.getLogger().addHandler(console)
 
+# One JSON formatter on the root logger when python-json-logger is
+# installed, so app, bot and uvicorn lines share a machine-parseable
+# format; plain text stays the fallback.
+try:
+    from pythonjsonlogger import jsonlogger
+except ImportError:
+    pass
+else:
+    _json_formatter = jsonlogger.JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    for _handler in logging.getLogger().handlers:
+        _handler.setFormatter(_json_formatter)
+
 logger = logging.getLogger(__name__)
 
 SYNC_INTERVAL_HOURS = 2
@@ -42,54 +53,80 @@ def run_supabase_sync_loop():
         time.sleep(SYNC_INTERVAL_HOURS * 3600)
 
 
-def run_web_server():
-    """Run FastAPI server in a separate thread."""
+def load_whisper_model():
+    """Load the local faster-whisper model (optional, CPU int8).
+
+    Returns None when faster-whisper isn't installed or loading fails,
+    in which case transcription stays on Groq.
+    """
+    model_name = os.getenv("LOCAL_WHISPER_MODEL", "small")
+    if not model_name or model_name.lower() == "off":
+        return None
+    try:
+        from faster_whisper import WhisperModel
+    except ImportError:
+        logger.info("faster-whisper not installed; transcription stays on Groq")
+        return None
+    # Leave half the cores for the web server/bot so inference doesn't
+    # oversubscribe the box (CTranslate2 defaults to all cores)
+    cpu_threads = int(os.getenv("WHISPER_CPU_THREADS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+    try:
+        model = WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+    except Exception as e:
+        logger.error(f"Failed to load local Whisper model '{model_name}': {e}")
+        return None
+    logger.info(f"Local Whisper model '{model_name}' loaded (int8, CPU, {cpu_threads} threads)")
+    return model
+
+
+async def main():
+    """Run the web server and the Telegram bot on one event loop."""
     import uvicorn
     import web_server
     import db
     import supabase_sync as sb
 
+    # Add current dir to path so app.py can be imported
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    # Import app.py as a regular module (it won't call main() because __name__ != "__main__")
+    import app as bot_app
+
     # Run migrations
     db.migrate()
 
+    # Share a warm local Whisper model with the web server (Groq fallback)
+    web_server.whisper_model = load_whisper_model()
+
     # Restore from Supabase if local DB is empty (e.g. after fresh deploy)
     sb.restore_from_supabase()
 
-    # Start periodic Supabase backup
+    # Start periodic Supabase backup (sync psycopg2 work stays on a thread)
     sync_thread = threading.Thread(target=run_supabase_sync_loop, daemon=True, name="supabase-sync")
     sync_thread.start()
     logger.info(f"Supabase sync scheduler started (every {SYNC_INTERVAL_HOURS}h)")
 
     port = int(os.getenv("WEB_PORT", "8000"))
-    logger.info(f"Starting web server on port {port}...")
-    uvicorn.run(web_server.app, host="0.0.0.0", port=port, log_level="info")
+    config = uvicorn.Config(
+        web_server.app, host="0.0.0.0", port=port, log_level="info", http="httptools"
+    )
+    server = uvicorn.Server(config)
 
+    logger.info(f"Starting web server on port {port} and Telegram bot...")
+    await asyncio.gather(server.serve(), bot_app.main())
 
-async def run_bot():
-    """Run the Telegram bot by importing app module and calling main()."""
-    logger.info("Starting Telegram bot...")
 
-    # Add current dir to path so app.py can be imported
-    if os.getcwd() not in sys.path:
-        sys.path.insert(0, os.getcwd())
-
-    # Import app.py as a regular module (it won't call main() because __name__ != "__main__")
-    import app as bot_app
-    await bot_app.main()
-
-
-def main():
-    # Start web server in a thread
-    web_thread = threading.Thread(target=run_web_server, daemon=True)
-    web_thread.start()
-    logger.info("Web server thread started")
+if __name__ == "__main__":
+    # uvloop must be installed before the loop is created; uvicorn's own
+    # loop setup doesn't apply when we drive Server.serve() ourselves.
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
 
-    # Run bot in main thread's event loop
     try:
-        asyncio.run(run_bot())
+        asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Shutting down...")
-
-
-if __name__ == "__main__":
-    main()
@@ -3,30 +3,46 @@ FastAPI backend for Multilevel Speaking Practice Telegram Mini App.
 Provides REST API with Telegram initData authentication.
 """
 import os
+import re
 import json
+import random
+import gzip
 import hmac
+import time
 import hashlib
-import tempfile
-import subprocess
+import threading
 import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.parse import parse_qs, unquote
+from urllib.parse import parse_qs, parse_qsl
 
 from fastapi import FastAPI, Request, HTTPException, Depends, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 
 import aiohttp
+import httpx
+import orjson
+from cachetools import TTLCache
+import edge_tts
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+
 import db
 import mobile_auth
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Multilevel Speaking Practice")
+app = FastAPI(title="Multilevel Speaking Practice", default_response_class=ORJSONResponse)
+
+# Questions, tips and the JS/CSS bundles are highly repetitive text;
+# small responses aren't worth the CPU, hence the threshold
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # CORS for the Capacitor mobile app. Telegram Mini App is same-origin.
 app.add_middleware(
@@ -37,10 +53,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in sampling profiler: run with PROFILING=1 and append ?profile=1 to
+# any request to get a pyinstrument flamegraph instead of the response.
+# Not registered at all in normal operation, so the hot path pays nothing.
+if os.getenv("PROFILING") == "1":
+    from pyinstrument import Profiler
+    from fastapi.responses import HTMLResponse
+
+    @app.middleware("http")
+    async def _profile_request(request, call_next):
+        if request.query_params.get("profile"):
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            await call_next(request)
+            profiler.stop()
+            return HTMLResponse(profiler.output_html())
+        return await call_next(request)
+
+# Local faster-whisper model shared across requests. run.py loads it at
+# startup when faster-whisper is installed; None means transcribe via Groq.
+whisper_model = None
+
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+# Fixed function of the bot token — derive once instead of per request
+_SECRET_KEY = hmac.new(b"WebAppData", TELEGRAM_TOKEN.encode(), hashlib.sha256).digest()
 OPENAI_KEY = os.getenv("OPENAI_API_KEY", "")
 GROQ_KEY = os.getenv("GROQ_API_KEY", "")
 CHANNEL_USERNAME = os.getenv("CHANNEL_USERNAME", "@MultilevelSpeaking9")
+# A pronunciation clip is 1-3 words; anything bigger is abuse
+MAX_PRONUNCIATION_UPLOAD = 2_000_000
+# A part-3 answer tops out around two minutes of opus — 10 MB leaves
+# generous headroom while keeping peak per-request memory bounded
+MAX_SESSION_UPLOAD = 10_000_000
+
+# Shared async API clients behind one HTTP/2 connection pool — created
+# lazily so importing this module never requires the API keys to be set.
+# HTTP/2 lets concurrent GPT and transcription calls multiplex over a
+# single TLS connection per host.
+_shared_http = None
+_openai_async = None
+_groq_async = None
+
+
+def _get_shared_http() -> httpx.AsyncClient:
+    global _shared_http
+    if _shared_http is None:
+        _shared_http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=30.0,
+        )
+    return _shared_http
+
+
+def _get_openai() -> AsyncOpenAI:
+    global _openai_async
+    if _openai_async is None:
+        _openai_async = AsyncOpenAI(api_key=OPENAI_KEY, http_client=_get_shared_http())
+    return _openai_async
+
+
+def _get_groq() -> AsyncGroq:
+    global _groq_async
+    if _groq_async is None:
+        _groq_async = AsyncGroq(api_key=GROQ_KEY, http_client=_get_shared_http())
+    return _groq_async
+
 EDGE_TTS_VOICES = {
     "sarah": "en-US-JennyNeural",
     "lily": "en-GB-SoniaNeural",
@@ -51,59 +129,121 @@ EDGE_TTS_VOICES = {
 # Load questions
 TESTS = []
 try:
-    with open("questions.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
+    with open("questions.json", "rb") as f:
+        data = orjson.loads(f.read())
         TESTS = data.get("tests", [])
 except FileNotFoundError:
     logger.warning("questions.json not found")
 
+# Per-part question buckets, built once at load — handlers look these up
+# instead of scanning every test per request
+QUESTIONS_BY_PART = {}
+for _t in TESTS:
+    for _part, _pd in _t.get("parts", {}).items():
+        QUESTIONS_BY_PART.setdefault(_part, []).extend(_pd.get("questions", []))
+
+# How many questions a practice session draws per part, fixed at load
+_PICK_COUNTS = {part: min(3, len(qs)) for part, qs in QUESTIONS_BY_PART.items()}
+
+# Topic labels per part (debate topic for part 3, test name otherwise),
+# plus the names-only fallback for parts no test defines
+TOPICS_BY_PART = {}
+for _t in TESTS:
+    for _part, _pd in _t.get("parts", {}).items():
+        TOPICS_BY_PART.setdefault(_part, []).append(
+            _pd.get("topic", "") if _pd.get("type") == "debate" else _t["name"]
+        )
+_DEFAULT_TOPICS = [_t["name"] for _t in TESTS]
+
+# Question/topic payloads only change at deploy time; one ETag derived
+# from the loaded data lets repeat page loads come back 304
+_CONTENT_ETAG = '"' + hashlib.blake2b(orjson.dumps(TESTS), digest_size=16).hexdigest() + '"'
+
 
 # ─── Telegram Auth ─────────────────────────────────────────────
 
+MAX_INIT_DATA_LEN = 8 * 1024
+AUTH_MAX_AGE_SECONDS = 86400
+
+
 def validate_init_data(init_data: str) -> dict:
     """Validate Telegram Mini App initData using HMAC-SHA256."""
     init_data = init_data.strip()
 
-    # Parse into raw (URL-encoded) and decoded key-value pairs
-    raw_dict = {}
-    decoded_dict = {}
-    for pair in init_data.split("&"):
-        if "=" not in pair:
-            continue
-        key, value = pair.split("=", 1)
-        raw_dict[key] = value
-        decoded_dict[key] = unquote(value)
-
-    received_hash = raw_dict.pop("hash", None)
-    decoded_dict.pop("hash", None)
+    # Single C-implemented parse for the decoded pairs; the raw variant is
+    # only reconstructed if the decoded hash fails below
+    decoded_dict = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=False))
+
+    received_hash = decoded_dict.pop("hash", None)
     if not received_hash:
         raise HTTPException(status_code=401, detail="Missing hash")
 
-    secret_key = hmac.new(b"WebAppData", TELEGRAM_TOKEN.encode(), hashlib.sha256).digest()
+    # A real hash is exactly 64 hex chars; decoding to 32 raw bytes both
+    # validates the format and lets compare_digest run on digests directly
+    # instead of twice-as-long hex strings
+    try:
+        received_bytes = bytes.fromhex(received_hash)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid hash format")
+    if len(received_bytes) != 32:
+        raise HTTPException(status_code=401, detail="Invalid hash format")
+
+    # Reject stale initData before spending any SHA256 work on it — replayed
+    # tokens are cheap to bounce and never pollute the validation cache
+    try:
+        auth_ts = int(decoded_dict.get("auth_date", "0"))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=401, detail="Bad auth_date")
+    if time.time() - auth_ts > AUTH_MAX_AGE_SECONDS:
+        raise HTTPException(status_code=401, detail="initData expired")
 
     # Try decoded values first (standard approach)
     dcs_decoded = "\n".join(f"{k}={v}" for k, v in sorted(decoded_dict.items()))
-    hash_decoded = hmac.new(secret_key, dcs_decoded.encode(), hashlib.sha256).hexdigest()
-
-    # Try raw (URL-encoded) values as fallback
-    dcs_raw = "\n".join(f"{k}={v}" for k, v in sorted(raw_dict.items()))
-    hash_raw = hmac.new(secret_key, dcs_raw.encode(), hashlib.sha256).hexdigest()
+    hash_decoded = hmac.new(_SECRET_KEY, dcs_decoded.encode(), hashlib.sha256).digest()
 
-    if hmac.compare_digest(hash_decoded, received_hash):
+    if hmac.compare_digest(hash_decoded, received_bytes):
         user_data_str = decoded_dict.get("user")
-    elif hmac.compare_digest(hash_raw, received_hash):
-        user_data_str = unquote(raw_dict.get("user", ""))
     else:
-        logger.warning("Auth failed: hash mismatch")
-        raise HTTPException(status_code=401, detail="Invalid hash")
+        # Only hash the raw (URL-encoded) variant when the standard form fails
+        raw_dict = dict(p.split("=", 1) for p in init_data.split("&") if "=" in p)
+        raw_dict.pop("hash", None)
+        dcs_raw = "\n".join(f"{k}={v}" for k, v in sorted(raw_dict.items()))
+        hash_raw = hmac.new(_SECRET_KEY, dcs_raw.encode(), hashlib.sha256).digest()
+        if hmac.compare_digest(hash_raw, received_bytes):
+            # parse_qsl already URL-decoded this value; no second unquote
+            user_data_str = decoded_dict.get("user")
+        else:
+            logger.warning("Auth failed: hash mismatch")
+            raise HTTPException(status_code=401, detail="Invalid hash")
 
     if not user_data_str:
         raise HTTPException(status_code=401, detail="Missing user data")
 
-    user_data = json.loads(user_data_str)
+    user_data = orjson.loads(user_data_str)
     return user_data
 
 
+# initData is constant for the lifetime of a Mini App session, so the
+# parse + two HMACs + JSON decode only need to run once per session. TTL
+# keeps dead sessions from pinning entries the way a plain LRU would.
+_AUTH_CACHE = TTLCache(maxsize=10_000, ttl=300)
+
+
+def _validate_init_data_cached(init_data: str) -> tuple:
+    """Memoized validate_init_data. Returns (user_data, auth_ts) so callers
+    can re-check freshness on cache hits; failures are not cached."""
+    cached = _AUTH_CACHE.get(init_data)
+    if cached is not None:
+        return cached
+    user_data = validate_init_data(init_data)
+    try:
+        auth_ts = int(parse_qs(init_data).get("auth_date", ["0"])[0])
+    except (ValueError, TypeError):
+        auth_ts = 0
+    _AUTH_CACHE[init_data] = (user_data, auth_ts)
+    return user_data, auth_ts
+
+
 async def get_current_user(request: Request) -> dict:
     """Dependency: accept either Telegram initData (`tma ...`) or a JWT (`Bearer ...`)."""
     auth = request.headers.get("Authorization", "")
@@ -116,11 +256,12 @@ async def get_current_user(request: Request) -> dict:
         user_id = mobile_auth.verify_token(token)
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid or expired token")
-        existing = db.get_user(user_id) if hasattr(db, "get_user") else None
+        existing = await asyncio.to_thread(db.get_user, user_id) if hasattr(db, "get_user") else None
         first_name = existing.get("first_name", "") if existing else ""
         username = existing.get("username", "") if existing else ""
         photo_url = existing.get("photo_url", "") if existing else ""
-        user = db.get_or_create_user(
+        user = await asyncio.to_thread(
+            db.get_or_create_user,
             user_id=user_id,
             first_name=first_name,
             username=username,
@@ -134,8 +275,13 @@ async def get_current_user(request: Request) -> dict:
     else:
         init_data = auth
 
-    user_data = validate_init_data(init_data)
-    user = db.get_or_create_user(
+    if len(init_data) > MAX_INIT_DATA_LEN:
+        raise HTTPException(status_code=401, detail="initData too large")
+    user_data, auth_ts = _validate_init_data_cached(init_data)
+    if auth_ts and time.time() - auth_ts > AUTH_MAX_AGE_SECONDS:
+        raise HTTPException(status_code=401, detail="initData expired")
+    user = await asyncio.to_thread(
+        db.get_or_create_user,
         user_id=user_data["id"],
         first_name=user_data.get("first_name", ""),
         username=user_data.get("username", ""),
@@ -184,7 +330,7 @@ class SessionStart(BaseModel):
 # ─── Debug Endpoint ───────────────────────────────────────────
 
 @app.get("/api/debug/auth")
-async def debug_auth(request: Request):
+def debug_auth(request: Request):
     """Debug endpoint to inspect auth header and validation."""
     auth = request.headers.get("Authorization", "")
     if auth.startswith("tma "):
@@ -208,11 +354,37 @@ async def debug_auth(request: Request):
 
 # ─── API Endpoints ─────────────────────────────────────────────
 
+# Dashboard polls re-request near-static per-user numbers; hold them for
+# 30 s and pop the key whenever the user writes something that moves them.
+# Unlike the loop-only auth/weekly caches, this one is touched from anyio
+# worker threads and the event loop, and TTLCache isn't thread-safe, so
+# every access goes through the lock. The DB query runs outside it.
+_USER_STATS_CACHE = TTLCache(maxsize=10_000, ttl=30)
+_USER_STATS_LOCK = threading.Lock()
+
+
+def _user_stats(user_id):
+    """Single-query dashboard bundle with a short per-user TTL."""
+    with _USER_STATS_LOCK:
+        stats = _USER_STATS_CACHE.get(user_id)
+    if stats is None:
+        stats = db.get_user_dashboard(user_id)
+        with _USER_STATS_LOCK:
+            _USER_STATS_CACHE[user_id] = stats
+    return stats
+
+
+def _drop_user_stats(user_id):
+    with _USER_STATS_LOCK:
+        _USER_STATS_CACHE.pop(user_id, None)
+
+
 @app.get("/api/user/me")
-async def get_me(user=Depends(get_current_user)):
-    settings = db.get_user_settings(user["user_id"])
-    total_sessions = db.get_total_sessions(user["user_id"])
-    total_hours = db.get_total_practice_hours(user["user_id"])
+def get_me(user=Depends(get_current_user)):
+    stats = _user_stats(user["user_id"])
+    settings = stats["settings"]
+    total_sessions = stats["total_sessions"]
+    total_hours = stats["total_hours"]
     return {
         "user": {
             "user_id": user["user_id"],
@@ -231,7 +403,7 @@ async def get_me(user=Depends(get_current_user)):
 
 
 @app.put("/api/user/settings")
-async def update_settings(body: SettingsUpdate, user=Depends(get_current_user)):
+def update_settings(body: SettingsUpdate, user=Depends(get_current_user)):
     updates = {}
     if body.dark_mode is not None:
         updates["dark_mode"] = 1 if body.dark_mode else 0
@@ -248,12 +420,17 @@ async def update_settings(body: SettingsUpdate, user=Depends(get_current_user)):
 
     if updates:
         db.update_user_settings(user["user_id"], **updates)
+        _drop_user_stats(user["user_id"])
 
     return db.get_user_settings(user["user_id"])
 
 
 @app.get("/api/questions")
-async def get_questions(part: str = "1.1", test_id: int = None, user=Depends(get_current_user)):
+def get_questions(request: Request, response: Response, part: str = "1.1", test_id: int = None, user=Depends(get_current_user)):
+    if request.headers.get("if-none-match") == _CONTENT_ETAG:
+        return Response(status_code=304)
+    response.headers["ETag"] = _CONTENT_ETAG
+    response.headers["Cache-Control"] = "private, max-age=3600"
     if test_id is not None:
         test = next((t for t in TESTS if t["test_id"] == test_id), None)
         if not test:
@@ -261,11 +438,7 @@ async def get_questions(part: str = "1.1", test_id: int = None, user=Depends(get
         part_data = test["parts"].get(part, {})
         return {"questions": part_data.get("questions", []), "part_data": part_data, "total": len(part_data.get("questions", []))}
     # Return questions from all tests for this part
-    all_questions = []
-    for t in TESTS:
-        part_data = t["parts"].get(part, {})
-        for q in part_data.get("questions", []):
-            all_questions.append(q)
+    all_questions = QUESTIONS_BY_PART.get(part, [])
     return {"questions": all_questions, "total": len(all_questions)}
 
 
@@ -276,7 +449,7 @@ async def get_tests(user=Depends(get_current_user)):
 
 
 @app.get("/api/session-info")
-async def session_info(user=Depends(get_current_user)):
+def session_info(user=Depends(get_current_user)):
     limits = db.get_user_limits(user["user_id"])
     return {
         "plan": limits["plan"],
@@ -295,14 +468,12 @@ async def session_info(user=Depends(get_current_user)):
 
 
 @app.get("/api/topics")
-async def get_topics(part: str = "1.1", user=Depends(get_current_user)):
-    topics = []
-    for t in TESTS:
-        part_data = t["parts"].get(part, {})
-        if part_data.get("type") == "debate":
-            topics.append(part_data.get("topic", ""))
-        else:
-            topics.append(t["name"])
+async def get_topics(request: Request, response: Response, part: str = "1.1", user=Depends(get_current_user)):
+    if request.headers.get("if-none-match") == _CONTENT_ETAG:
+        return Response(status_code=304)
+    response.headers["ETag"] = _CONTENT_ETAG
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    topics = TOPICS_BY_PART.get(part, _DEFAULT_TOPICS)
     return {"topics": topics, "total": len(topics)}
 
 
@@ -310,7 +481,7 @@ CARD_NUMBER = "5614 6819 1914 7144"
 CARD_HOLDER = "Nematov Shahzod"
 
 @app.post("/api/sessions/start")
-async def start_session(body: SessionStart, user=Depends(get_current_user)):
+def start_session(body: SessionStart, user=Depends(get_current_user)):
     if body.type == "mock":
         allowed = db.increment_mock_usage(user["user_id"])
         if not allowed:
@@ -330,7 +501,6 @@ async def start_session(body: SessionStart, user=Depends(get_current_user)):
 
     session_id = db.create_session(user["user_id"], body.type, body.part)
 
-    import random
     if body.type == "mock" and body.test_id:
         # Pick specific test
         test = next((t for t in TESTS if t["test_id"] == body.test_id), None)
@@ -344,11 +514,7 @@ async def start_session(body: SessionStart, user=Depends(get_current_user)):
 
     # Practice mode - pick questions for specific part
     part = body.part
-    all_questions = []
-    for t in TESTS:
-        part_data = t["parts"].get(part, {})
-        qs = part_data.get("questions", [])
-        all_questions.extend(qs)
+    all_questions = QUESTIONS_BY_PART.get(part, [])
 
     if part == "3":
         # For debate, pick a random test's debate data
@@ -363,31 +529,53 @@ async def start_session(body: SessionStart, user=Depends(get_current_user)):
             pd = test["parts"].get("1.2", {})
             return {"session_id": session_id, "questions": pd.get("questions", []), "images": pd.get("images", [])}
 
-    questions = random.sample(all_questions, min(3, len(all_questions))) if all_questions else []
+    k = _PICK_COUNTS.get(part, 0)
+    if len(all_questions) <= k:
+        # Sampling the whole pool is a no-op shuffle; just hand it over
+        questions = list(all_questions)
+    else:
+        questions = random.sample(all_questions, k)
     return {"session_id": session_id, "questions": questions}
 
 
+def _pcm_to_wav(pcm: bytes) -> bytes:
+    """Wrap raw 16 kHz mono s16le PCM in a minimal RIFF header."""
+    header = (
+        b"RIFF" + (36 + len(pcm)).to_bytes(4, "little") + b"WAVEfmt "
+        + (16).to_bytes(4, "little")
+        + (1).to_bytes(2, "little")          # PCM
+        + (1).to_bytes(2, "little")          # mono
+        + (16000).to_bytes(4, "little")      # sample rate
+        + (32000).to_bytes(4, "little")      # byte rate
+        + (2).to_bytes(2, "little")          # block align
+        + (16).to_bytes(2, "little")         # bits per sample
+        + b"data" + len(pcm).to_bytes(4, "little")
+    )
+    return header + pcm
+
+
 @app.post("/api/sessions/{session_id}/respond")
 async def session_respond(
     session_id: int,
+    request: Request,
     audio: UploadFile = File(...),
     question: str = Form(""),
     part: str = Form("1.1"),
     debate_side: str = Form(""),
     user=Depends(get_current_user),
 ):
-    session = db.get_session(session_id)
+    # Reject oversized posts before touching the body, then enforce the
+    # same budget while streaming in case Content-Length lied
+    if int(request.headers.get("content-length") or 0) > MAX_SESSION_UPLOAD:
+        raise HTTPException(413, "Audio too large")
+
+    session = await asyncio.to_thread(db.get_session, session_id)
     if not session:
         raise HTTPException(404, "Session not found")
     if session["user_id"] != user["user_id"]:
         raise HTTPException(403, "Not your session")
 
-    # Save audio to temp file — detect extension from content type
-    audio_data = await audio.read()
-    if len(audio_data) < 1000:
-        raise HTTPException(400, "Audio too short")
-
-    # Map content type to extension
+    # Map content type to extension (used for the Groq fallback filename)
     ct = (audio.content_type or "").lower()
     ext_map = {
         "audio/webm": ".webm", "audio/ogg": ".ogg",
@@ -396,125 +584,143 @@ async def session_respond(
     }
     ext = ext_map.get(ct.split(";")[0], ".ogg")
 
-    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-        tmp.write(audio_data)
-        tmp.flush()
-        audio_path = tmp.name
+    # Stream the upload into ffmpeg stdin in 64 KB chunks and read raw
+    # 16 kHz mono PCM from stdout — no temp files, peak memory stays
+    # bounded, and the duration falls out of the PCM byte count instead
+    # of an ffprobe spawn
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ar", "16000", "-ac", "1", "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
 
-    wav_path = audio_path + ".wav"
+    total_in = 0
+    too_large = False
 
-    try:
-        # Convert to wav for Groq compatibility
-        convert_result = subprocess.run(
-            ["ffmpeg", "-y", "-i", audio_path, "-ar", "16000", "-ac", "1", wav_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
+    async def _feed():
+        nonlocal total_in, too_large
+        try:
+            while chunk := await audio.read(64 * 1024):
+                total_in += len(chunk)
+                if total_in > MAX_SESSION_UPLOAD:
+                    # Stop feeding and kill ffmpeg so the other gather
+                    # branches unblock; the flag turns into a 413 below
+                    too_large = True
+                    proc.kill()
+                    return
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg exited early; the returncode check below handles it
+
+    pcm, _, _ = await asyncio.gather(proc.stdout.read(), proc.stderr.read(), _feed())
+    await proc.wait()
+
+    if too_large:
+        raise HTTPException(413, "Audio too large")
+    if total_in < 1000:
+        raise HTTPException(400, "Audio too short")
 
-        # If conversion fails, try sending original directly to Groq
-        use_path = wav_path if convert_result.returncode == 0 else audio_path
+    if proc.returncode == 0 and pcm:
+        upload = ("audio.wav", _pcm_to_wav(pcm))
+        duration = len(pcm) // (16000 * 2)
+    else:
+        # Conversion failed — rewind the spooled upload and send the
+        # original bytes directly to Groq
+        await audio.seek(0)
+        upload = (f"audio{ext}", await audio.read())
+        duration = 0
+
+    transcription_result = await _get_groq().audio.transcriptions.create(
+        file=upload,
+        model="whisper-large-v3-turbo",
+        language="en",
+        prompt=f"Multilevel Speaking Part {part} response to: {question}",
+    )
+    transcription = transcription_result.text.strip()
 
-        from groq import Groq
-        groq_client = Groq(api_key=GROQ_KEY)
+    if not transcription:
+        raise HTTPException(400, "Could not transcribe audio")
 
-        with open(use_path, "rb") as audio_file:
-            transcription_result = groq_client.audio.transcriptions.create(
-                file=(use_path, audio_file.read()),
-                model="whisper-large-v3-turbo",
-                language="en",
-                prompt=f"Multilevel Speaking Part {part} response to: {question}",
-            )
-        transcription = transcription_result.text.strip()
+    await asyncio.to_thread(db.add_response, session_id, question, transcription, duration, part)
+    _drop_user_stats(user["user_id"])
+    _WEEKLY_CACHE.pop(user["user_id"], None)
 
-        if not transcription:
-            raise HTTPException(400, "Could not transcribe audio")
+    return {
+        "transcription": transcription,
+        "duration": duration,
+    }
 
-        # Get audio duration via ffprobe
-        duration_result = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "default=noprint_wrappers=1:nokey=1", use_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        try:
-            duration = int(float(duration_result.stdout.strip()))
-        except (ValueError, TypeError):
-            duration = 0
 
-        db.add_response(session_id, question, transcription, duration, part)
+class CompleteRequest(BaseModel):
+    level: str = "intermediate"
+    mood: str = "normal"
 
-        return {
-            "transcription": transcription,
-            "duration": duration,
-        }
 
-    finally:
-        for f in [audio_path, wav_path]:
-            try:
-                os.remove(f)
-            except OSError:
-                pass
+# Scoring prompt pieces are immutable — build them once, not per session
+LEVEL_INSTRUCTIONS = {
+    "beginner": "Be encouraging and lenient. Focus on what the learner did well. Most responses should score 20-40.",
+    "intermediate": "Apply standard scoring criteria fairly. Most responses should score 35-55.",
+    "advanced": "Be strict. Expect sophisticated vocabulary, complex grammar, natural fluency. Only give 55+ for truly excellent performance.",
+}
 
+MOOD_INSTRUCTIONS = {
+    "happy": (
+        "You are in a HAPPY, generous mood today. "
+        "You see the best in every answer. Add +0.5 bonus to each score criterion. "
+        "Your feedback should be very positive and encouraging, highlighting strengths."
+    ),
+    "normal": "",
+    "angry": (
+        "You are in a STRICT, harsh mood today. "
+        "You are very critical of every mistake. Deduct 1.0 point from each score criterion. "
+        "Your feedback should be blunt and focus heavily on errors and weaknesses."
+    ),
+}
+
+SCORING_PROMPT_RULES = (
+    "Analyze the following responses.\n"
+    "Score each criterion on a 0-75 INTEGER scale:\n"
+    "1. Fluency and Coherence\n2. Lexical Resource\n"
+    "3. Grammatical Range and Accuracy\n4. Pronunciation\n\n"
+    "CEFR mapping: C1(65-75), B2(51-64), B1(38-50), Below B1(0-37)\n\n"
+    "Return ONLY valid JSON (no markdown, no code fences) in this format:\n"
+    '{"fluency": 55, "lexical": 50, "grammar": 48, "pronunciation": 52, '
+    '"overall": 51, "feedback": "Your detailed feedback here.", '
+    '"cefr_level": "B2", '
+    '"grammar_corrections": [{"original": "wrong phrase", "corrected": "correct phrase", "explanation": "brief reason"}], '
+    '"pronunciation_issues": [{"word": "word", "tip": "pronunciation tip"}]}\n\n'
+    "Include up to 5 grammar corrections and up to 3 pronunciation tips.\n\n"
+    "Responses:\n"
+)
 
-class CompleteRequest(BaseModel):
-    level: str = "intermediate"
-    mood: str = "normal"
 
 @app.post("/api/sessions/{session_id}/complete")
 async def complete_session(session_id: int, body: CompleteRequest = CompleteRequest(), user=Depends(get_current_user)):
-    session = db.get_session(session_id)
+    # One JOINed query instead of get_session + get_session_responses
+    session = await asyncio.to_thread(db.get_session_with_responses, session_id)
     if not session:
         raise HTTPException(404, "Session not found")
     if session["user_id"] != user["user_id"]:
         raise HTTPException(403, "Not your session")
 
-    responses = db.get_session_responses(session_id)
+    responses = session["responses"]
     if not responses:
         raise HTTPException(400, "No responses in session")
 
-    # Level-based scoring instructions
-    level_instructions = {
-        "beginner": "Be encouraging and lenient. Focus on what the learner did well. Most responses should score 20-40.",
-        "intermediate": "Apply standard scoring criteria fairly. Most responses should score 35-55.",
-        "advanced": "Be strict. Expect sophisticated vocabulary, complex grammar, natural fluency. Only give 55+ for truly excellent performance.",
-    }
-
-    level = body.level if body.level in level_instructions else "intermediate"
-    level_text = level_instructions[level]
-
-    mood_instructions = {
-        "happy": (
-            "You are in a HAPPY, generous mood today. "
-            "You see the best in every answer. Add +0.5 bonus to each score criterion. "
-            "Your feedback should be very positive and encouraging, highlighting strengths."
-        ),
-        "normal": "",
-        "angry": (
-            "You are in a STRICT, harsh mood today. "
-            "You are very critical of every mistake. Deduct 1.0 point from each score criterion. "
-            "Your feedback should be blunt and focus heavily on errors and weaknesses."
-        ),
-    }
-    mood = body.mood if body.mood in mood_instructions else "normal"
-    mood_text = mood_instructions[mood]
+    level_text = LEVEL_INSTRUCTIONS.get(body.level, LEVEL_INSTRUCTIONS["intermediate"])
+    mood_text = MOOD_INSTRUCTIONS.get(body.mood, "")
 
-    # Build GPT prompt
+    # Only the per-session fragment is built here
     mood_section = f"{mood_text}\n\n" if mood_text else ""
     prompt = (
         f"You are a certified Multilevel speaking examiner.\n"
         f"{level_text}\n\n"
         f"{mood_section}"
-        "Analyze the following responses.\n"
-        "Score each criterion on a 0-75 INTEGER scale:\n"
-        "1. Fluency and Coherence\n2. Lexical Resource\n"
-        "3. Grammatical Range and Accuracy\n4. Pronunciation\n\n"
-        "CEFR mapping: C1(65-75), B2(51-64), B1(38-50), Below B1(0-37)\n\n"
-        "Return ONLY valid JSON (no markdown, no code fences) in this format:\n"
-        '{"fluency": 55, "lexical": 50, "grammar": 48, "pronunciation": 52, '
-        '"overall": 51, "feedback": "Your detailed feedback here.", '
-        '"cefr_level": "B2", '
-        '"grammar_corrections": [{"original": "wrong phrase", "corrected": "correct phrase", "explanation": "brief reason"}], '
-        '"pronunciation_issues": [{"word": "word", "tip": "pronunciation tip"}]}\n\n'
-        "Include up to 5 grammar corrections and up to 3 pronunciation tips.\n\n"
-        "Responses:\n"
+        f"{SCORING_PROMPT_RULES}"
     )
 
     for r in responses:
@@ -526,9 +732,9 @@ async def complete_session(session_id: int, body: CompleteRequest = CompleteRequ
         )
 
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_KEY)
-        response = client.chat.completions.create(
+        # Async client: the GPT round-trip (2-5 s) no longer blocks the
+        # event loop, so other sessions complete concurrently
+        response = await _get_openai().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a certified Multilevel speaking examiner. Return only valid JSON."},
@@ -536,14 +742,14 @@ async def complete_session(session_id: int, body: CompleteRequest = CompleteRequ
             ],
             max_tokens=800,
             temperature=0.5,
+            response_format={"type": "json_object"},
         )
         content = response.choices[0].message.content.strip()
 
-        # Try to parse JSON from response
-        if content.startswith("```"):
-            content = content.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-
-        scores_data = json.loads(content)
+        # json_object mode guarantees bare JSON — no fence stripping needed
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, so the
+        # except clause below keeps working
+        scores_data = orjson.loads(content)
         scores = {
             "fluency": scores_data.get("fluency", 0),
             "lexical": scores_data.get("lexical", 0),
@@ -555,7 +761,9 @@ async def complete_session(session_id: int, body: CompleteRequest = CompleteRequ
         grammar_corrections = scores_data.get("grammar_corrections", [])
         pronunciation_issues = scores_data.get("pronunciation_issues", [])
 
-        db.complete_session(session_id, scores, feedback)
+        await asyncio.to_thread(db.complete_session, session_id, scores, feedback)
+        _drop_user_stats(user["user_id"])
+        _WEEKLY_CACHE.pop(user["user_id"], None)
 
         cefr_level = scores_data.get("cefr_level", db.score_to_cefr(scores.get("overall", 0)))
         return {
@@ -570,22 +778,24 @@ async def complete_session(session_id: int, body: CompleteRequest = CompleteRequ
         # If GPT didn't return valid JSON, provide default scores
         scores = {"fluency": 40, "lexical": 40, "grammar": 38, "pronunciation": 40, "overall": 40}
         feedback = content if content else "Unable to generate detailed feedback."
-        db.complete_session(session_id, scores, feedback)
+        await asyncio.to_thread(db.complete_session, session_id, scores, feedback)
+        _drop_user_stats(user["user_id"])
+        _WEEKLY_CACHE.pop(user["user_id"], None)
         return {"scores": scores, "feedback": feedback}
 
     except Exception as e:
-        logger.error(f"GPT feedback error: {e}")
+        logger.error("GPT feedback error: %s", e)
         raise HTTPException(500, f"Feedback generation failed: {str(e)}")
 
 
 @app.get("/api/history")
-async def get_history(user=Depends(get_current_user)):
+def get_history(user=Depends(get_current_user)):
     sessions = db.get_all_sessions(user["user_id"])
     return {"sessions": sessions}
 
 
 @app.get("/api/history/{session_id}")
-async def get_history_detail(session_id: int, user=Depends(get_current_user)):
+def get_history_detail(session_id: int, user=Depends(get_current_user)):
     detail = db.get_session_detail(session_id)
     if not detail:
         raise HTTPException(404, "Session not found")
@@ -594,6 +804,11 @@ async def get_history_detail(session_id: int, user=Depends(get_current_user)):
     return detail
 
 
+def _ai_cache_key(*parts) -> str:
+    """Stable key for GPT answers persisted in the ai_cache table."""
+    return hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=16).hexdigest()
+
+
 class FollowUpRequest(BaseModel):
     question: str
     answer: str
@@ -601,9 +816,11 @@ class FollowUpRequest(BaseModel):
 
 @app.post("/api/follow-up")
 async def generate_follow_up(body: FollowUpRequest, user=Depends(get_current_user)):
+    cache_key = _ai_cache_key("follow_up", body.part, body.question, body.answer)
+    cached = await asyncio.to_thread(db.get_cached_answer, cache_key)
+    if cached:
+        return {"follow_up_question": cached}
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_KEY)
         prompt = (
             f"You are a Multilevel Speaking examiner conducting Part 3.\n"
             f"The candidate was asked: \"{body.question}\"\n"
@@ -614,7 +831,7 @@ async def generate_follow_up(body: FollowUpRequest, user=Depends(get_current_use
             "- Encourages the candidate to elaborate or give opinions\n\n"
             "Return ONLY the follow-up question text, nothing else."
         )
-        response = client.chat.completions.create(
+        response = await _get_openai().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a Multilevel examiner. Return only the follow-up question."},
@@ -624,9 +841,10 @@ async def generate_follow_up(body: FollowUpRequest, user=Depends(get_current_use
             temperature=0.7,
         )
         follow_up = response.choices[0].message.content.strip()
+        await asyncio.to_thread(db.put_cached_answer, cache_key, follow_up)
         return {"follow_up_question": follow_up}
     except Exception as e:
-        logger.error(f"Follow-up error: {e}")
+        logger.error("Follow-up error: %s", e)
         raise HTTPException(500, "Failed to generate follow-up question")
 
 
@@ -636,9 +854,13 @@ class SampleAnswerRequest(BaseModel):
 
 @app.post("/api/sample-answer")
 async def generate_sample_answer(body: SampleAnswerRequest, user=Depends(get_current_user)):
+    # Sample answers are stable per (part, question) — serve repeats from
+    # the DB instead of paying the 1-2 s OpenAI round-trip again
+    cache_key = _ai_cache_key("sample", body.part, body.question)
+    cached = await asyncio.to_thread(db.get_cached_answer, cache_key)
+    if cached:
+        return {"sample_answer": cached}
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_KEY)
         prompt = (
             f"You are a Multilevel Speaking expert. Generate a Score 60+ sample answer for this Multilevel Part {body.part} question:\n\n"
             f"Question: {body.question}\n\n"
@@ -650,7 +872,7 @@ async def generate_sample_answer(body: SampleAnswerRequest, user=Depends(get_cur
             f"- {'2-3 sentences' if body.part == 1 else '1-2 minutes of speech' if body.part == 2 else '3-5 sentences'}\n\n"
             "Return ONLY the sample answer text, no labels or headers."
         )
-        response = client.chat.completions.create(
+        response = await _get_openai().chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a Multilevel Speaking expert. Provide only the sample answer."},
@@ -660,29 +882,52 @@ async def generate_sample_answer(body: SampleAnswerRequest, user=Depends(get_cur
             temperature=0.7,
         )
         sample = response.choices[0].message.content.strip()
+        await asyncio.to_thread(db.put_cached_answer, cache_key, sample)
         return {"sample_answer": sample}
     except Exception as e:
-        logger.error(f"Sample answer error: {e}")
+        logger.error("Sample answer error: %s", e)
         raise HTTPException(500, "Failed to generate sample answer")
 
 
+# Weekly progress only moves when a session is recorded, so hold the
+# serialized response per user and let If-None-Match turn repeat polls
+# into 304s. The TTL bounds staleness from bot-side writes; web-side
+# writes pop the key alongside _USER_STATS_CACHE.
+_WEEKLY_CACHE = TTLCache(maxsize=10_000, ttl=30)
+
+
 @app.get("/api/progress/weekly")
-async def weekly_progress(user=Depends(get_current_user)):
-    days = db.get_weekly_progress(user["user_id"])
-    recent = db.get_recent_sessions(user["user_id"], limit=7)
-    return {
-        "days": days,
-        "recent_sessions": recent,
-    }
+async def weekly_progress(request: Request, user=Depends(get_current_user)):
+    user_id = user["user_id"]
+    cached = _WEEKLY_CACHE.get(user_id)
+    if cached is None:
+        # The two queries are independent — run them on the pool concurrently
+        days, recent = await asyncio.gather(
+            asyncio.to_thread(db.get_weekly_progress, user_id),
+            asyncio.to_thread(db.get_recent_sessions, user_id, limit=7),
+        )
+        body = orjson.dumps({"days": days, "recent_sessions": recent})
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        cached = (body, etag)
+        _WEEKLY_CACHE[user_id] = cached
+    body, etag = cached
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "private, max-age=30"},
+    )
 
 
 @app.get("/api/progress/streak")
-async def study_streak(user=Depends(get_current_user)):
+def study_streak(user=Depends(get_current_user)):
     streak = db.get_study_streak(user["user_id"])
-    total_sessions = db.get_total_sessions(user["user_id"])
-    total_hours = db.get_total_practice_hours(user["user_id"])
-    avg_score = db.get_average_score(user["user_id"])
-    settings = db.get_user_settings(user["user_id"])
+    stats = _user_stats(user["user_id"])
+    settings = stats["settings"]
+    total_sessions = stats["total_sessions"]
+    total_hours = stats["total_hours"]
+    avg_score = stats["average_score"]
     cefr_level = db.score_to_cefr(avg_score) if avg_score else None
     return {
         "streak": streak,
@@ -698,7 +943,7 @@ async def study_streak(user=Depends(get_current_user)):
 # ─── Leaderboard ─────────────────────────────────────────────
 
 @app.get("/api/leaderboard")
-async def leaderboard(user=Depends(get_current_user)):
+def leaderboard(user=Depends(get_current_user)):
     lb = db.get_leaderboard(limit=20, min_sessions=3)
     user_id = user["user_id"]
     rank_data = db.get_user_rank(user_id, min_sessions=3)
@@ -775,9 +1020,7 @@ async def get_vocabulary(user=Depends(get_current_user)):
 
 # ─── Pronunciation Drills ────────────────────────────────────
 
-@app.get("/api/content/pronunciation-drills")
-async def get_pronunciation_drills(user=Depends(get_current_user)):
-    return {
+PRONUNCIATION_DRILLS = {
         "drills": [
             {
                 "title": "Difficult Sounds",
@@ -817,15 +1060,118 @@ async def get_pronunciation_drills(user=Depends(get_current_user)):
         ]
     }
 
+_VS_RE = re.compile(r"\bvs\.?\s+")
+
+
+def _norm_target(s: str) -> str:
+    return _VS_RE.sub("", s.lower().strip())
+
+
+# Drill targets are a fixed set — normalize each once at load so the
+# checker does a dict lookup instead of string surgery per request.
+_NORMALIZED_TARGETS = {
+    item["word"]: _norm_target(item["word"])
+    for drill in PRONUNCIATION_DRILLS["drills"]
+    for item in drill["items"]
+}
+
+
+@app.get("/api/content/pronunciation-drills")
+async def get_pronunciation_drills(user=Depends(get_current_user)):
+    return PRONUNCIATION_DRILLS
+
+
+def _is_whisper_ready_wav(data: bytes) -> bool:
+    """True when the upload is already 16 kHz mono PCM WAV (no transcode needed)."""
+    if len(data) < 44 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return False
+    fmt_pos = data.find(b"fmt ", 12)
+    if fmt_pos == -1 or len(data) < fmt_pos + 16:
+        return False
+    audio_format = int.from_bytes(data[fmt_pos + 8:fmt_pos + 10], "little")
+    channels = int.from_bytes(data[fmt_pos + 10:fmt_pos + 12], "little")
+    sample_rate = int.from_bytes(data[fmt_pos + 12:fmt_pos + 16], "little")
+    return audio_format == 1 and channels == 1 and sample_rate == 16000
+
+
+def _transcribe_local(wav_bytes: bytes, prompt: str = "") -> str:
+    """Run the shared faster-whisper model on a 16 kHz mono PCM WAV buffer."""
+    import numpy as np
+
+    # Skip the RIFF header: PCM samples start after the "data" chunk marker
+    data_pos = wav_bytes.find(b"data")
+    pcm = wav_bytes[data_pos + 8:] if data_pos != -1 else wav_bytes[44:]
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    segments, _ = whisper_model.transcribe(
+        audio, language="en", beam_size=1, vad_filter=False,
+        initial_prompt=prompt or None,
+    )
+    return " ".join(s.text for s in segments).strip()
+
+
+# Dedicated bounded pool for whisper inference — the default executor grows
+# to min(32, cpu+4) threads and oversubscribes the cores under load. The
+# semaphore caps in-flight transcription passes to the same budget.
+_WHISPER_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("WHISPER_WORKERS", "2")), thread_name_prefix="whisper"
+)
+_WHISPER_SEM = asyncio.Semaphore(int(os.getenv("WHISPER_CONCURRENCY", "2")))
+
+
+async def _transcribe_async(wav_bytes: bytes, prompt: str = "") -> str:
+    """Run local transcription on the bounded whisper pool."""
+    async with _WHISPER_SEM:
+        return await asyncio.get_running_loop().run_in_executor(
+            _WHISPER_EXECUTOR, _transcribe_local, wav_bytes, prompt
+        )
+
+
+@app.on_event("startup")
+async def _warm_clients():
+    # uvloop/httptools are wired up by run.py, and workers stay at 1
+    # because the Telegram bot shares this process. What we can do here is
+    # open the outbound TLS connections early so the first user request
+    # doesn't pay the handshake.
+    if OPENAI_KEY:
+        try:
+            await _get_openai().models.list()
+        except Exception as e:
+            logger.warning("OpenAI warmup failed: %s", e)
+    if GROQ_KEY:
+        try:
+            await _get_groq().models.list()
+        except Exception as e:
+            logger.warning("Groq warmup failed: %s", e)
+
+
+@app.on_event("startup")
+async def _expand_threadpool():
+    # Plain-def handlers run on anyio's worker pool (default 40 tokens);
+    # raise the cap so short DB-bound requests don't queue behind each other
+    import anyio.to_thread
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 100
+
 
 @app.post("/api/pronunciation/check")
 async def check_pronunciation(
+    request: Request,
     audio: UploadFile = File(...),
     target: str = Form(""),
     user=Depends(get_current_user),
 ):
     """Transcribe audio and compare with target word/phrase."""
-    audio_data = await audio.read()
+    # Reject oversized posts before reading the body, then enforce the
+    # same budget while streaming in case Content-Length lied
+    if int(request.headers.get("content-length") or 0) > MAX_PRONUNCIATION_UPLOAD:
+        raise HTTPException(413, "Audio too large")
+
+    buf = bytearray()
+    while chunk := await audio.read(64 * 1024):
+        buf += chunk
+        if len(buf) > MAX_PRONUNCIATION_UPLOAD:
+            raise HTTPException(413, "Audio too large")
+    audio_data = bytes(buf)
     if len(audio_data) < 500:
         raise HTTPException(400, "Audio too short")
 
@@ -837,73 +1183,82 @@ async def check_pronunciation(
     }
     ext = ext_map.get(ct.split(";")[0], ".ogg")
 
-    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-        tmp.write(audio_data)
-        tmp.flush()
-        audio_path = tmp.name
-
-    wav_path = audio_path + ".wav"
-
-    try:
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", audio_path, "-ar", "16000", "-ac", "1", wav_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    # Decode in-memory: pipe the clip through ffmpeg stdin/stdout instead of
+    # writing temp files and blocking the loop on subprocess.run.
+    # Skip the transcode entirely when the browser already recorded
+    # 16 kHz mono PCM WAV — the common case for well-behaved clients.
+    if ext == ".wav" and _is_whisper_ready_wav(audio_data):
+        wav_bytes = audio_data
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+            "-ar", "16000", "-ac", "1", "-f", "wav", "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
-        use_path = wav_path if os.path.exists(wav_path) else audio_path
-
-        from groq import Groq
-        groq_client = Groq(api_key=GROQ_KEY)
+        out, _ = await proc.communicate(audio_data)
+        wav_bytes = out if proc.returncode == 0 and out else None
 
-        with open(use_path, "rb") as f:
-            result = groq_client.audio.transcriptions.create(
-                file=(use_path, f.read()),
-                model="whisper-large-v3-turbo",
-                language="en",
-                prompt=f"Pronunciation practice: {target}",
+    # Prefer the warm local model — a 1-3 word clip transcribes in tens of
+    # milliseconds on CPU vs a full network round-trip to Groq.
+    transcription = None
+    if whisper_model is not None and wav_bytes is not None:
+        try:
+            transcription = await _transcribe_async(
+                wav_bytes, f"Pronunciation practice: {target}"
             )
+        except Exception as e:
+            logger.warning("Local transcription failed, falling back to Groq: %s", e)
+            transcription = None
+
+    if not transcription:
+        # Send the converted wav; fall back to the original upload if
+        # conversion failed (Groq decodes most containers itself)
+        upload = ("audio.wav", wav_bytes) if wav_bytes is not None else (f"audio{ext}", audio_data)
+        result = await _get_groq().audio.transcriptions.create(
+            file=upload,
+            model="whisper-large-v3-turbo",
+            language="en",
+            prompt=f"Pronunciation practice: {target}",
+        )
         transcription = result.text.strip()
 
-        # Simple similarity scoring
-        target_clean = target.lower().strip().replace("vs ", "").replace("vs. ", "")
-        heard_clean = transcription.lower().strip()
+    # Simple similarity scoring
+    target_clean = _NORMALIZED_TARGETS.get(target) or _norm_target(target)
+    heard_clean = transcription.lower().strip()
 
-        # Calculate word-level match
-        target_words = set(target_clean.split())
-        heard_words = set(heard_clean.split())
+    # Calculate word-level match
+    target_words = set(target_clean.split())
+    heard_words = set(heard_clean.split())
 
-        if target_words:
-            matches = len(target_words & heard_words)
-            score = min(100, int((matches / len(target_words)) * 100))
-        else:
-            score = 50 if transcription else 0
-
-        # Boost score if close match
-        if heard_clean == target_clean:
-            score = 100
-        elif target_clean in heard_clean or heard_clean in target_clean:
-            score = max(score, 80)
-
-        feedback = ""
-        if score >= 90:
-            feedback = "Excellent pronunciation!"
-        elif score >= 70:
-            feedback = "Good job! Minor differences detected."
-        elif score >= 50:
-            feedback = "Keep practicing. Try to match the target more closely."
-        else:
-            feedback = "Try listening again and repeat more slowly."
+    if target_words:
+        matches = len(target_words & heard_words)
+        score = min(100, int((matches / len(target_words)) * 100))
+    else:
+        score = 50 if transcription else 0
+
+    # Boost score if close match
+    if heard_clean == target_clean:
+        score = 100
+    elif target_clean in heard_clean or heard_clean in target_clean:
+        score = max(score, 80)
+
+    feedback = ""
+    if score >= 90:
+        feedback = "Excellent pronunciation!"
+    elif score >= 70:
+        feedback = "Good job! Minor differences detected."
+    elif score >= 50:
+        feedback = "Keep practicing. Try to match the target more closely."
+    else:
+        feedback = "Try listening again and repeat more slowly."
 
-        return {
-            "transcription": transcription,
-            "score": score,
-            "feedback": feedback,
-        }
-    finally:
-        for f in [audio_path, wav_path]:
-            try:
-                os.remove(f)
-            except OSError:
-                pass
+    return {
+        "transcription": transcription,
+        "score": score,
+        "feedback": feedback,
+    }
 
 
 # ─── Admin Auth ──────────────────────────────────────────────
@@ -911,7 +1266,7 @@ async def check_pronunciation(
 async def get_admin_user(request: Request) -> dict:
     """Dependency: validate user is admin."""
     user = await get_current_user(request)
-    if not db.is_admin(user["user_id"]):
+    if not await asyncio.to_thread(db.is_admin, user["user_id"]):
         raise HTTPException(403, "Admin access required")
     return user
 
@@ -920,19 +1275,17 @@ async def get_admin_user(request: Request) -> dict:
 
 @app.get("/api/subscription")
 async def get_subscription(user=Depends(get_current_user)):
-    limits = db.get_user_limits(user["user_id"])
+    limits = await asyncio.to_thread(db.get_user_limits, user["user_id"])
     return limits
 
 
 class SubscriptionRequest(BaseModel):
-    plan: str
+    plan: Literal["weekly", "monthly"]
 
 
 @app.post("/api/subscription/request")
 async def request_subscription(body: SubscriptionRequest, user=Depends(get_current_user)):
-    if body.plan not in db.PLANS:
-        raise HTTPException(400, "Invalid plan. Choose 'weekly' or 'monthly'.")
-    result = db.create_subscription_request(user["user_id"], body.plan)
+    result = await asyncio.to_thread(db.create_subscription_request, user["user_id"], body.plan)
     if "error" in result:
         raise HTTPException(400, result["error"])
     plan_info = db.PLANS[body.plan]
@@ -948,7 +1301,7 @@ async def request_subscription(body: SubscriptionRequest, user=Depends(get_curre
 
 @app.get("/api/admin/subscriptions")
 async def admin_subscriptions(user=Depends(get_admin_user)):
-    pending = db.get_pending_subscriptions()
+    pending = await asyncio.to_thread(db.get_pending_subscriptions)
     return {"subscriptions": pending}
 
 
@@ -959,9 +1312,9 @@ class SubActionRequest(BaseModel):
 @app.put("/api/admin/subscriptions/{sub_id}")
 async def admin_sub_action(sub_id: int, body: SubActionRequest, user=Depends(get_admin_user)):
     if body.action == "approve":
-        result = db.approve_subscription(sub_id, user["user_id"])
+        result = await asyncio.to_thread(db.approve_subscription, sub_id, user["user_id"])
     elif body.action == "reject":
-        result = db.reject_subscription(sub_id)
+        result = await asyncio.to_thread(db.reject_subscription, sub_id)
     else:
         raise HTTPException(400, "Invalid action")
     if "error" in result:
@@ -973,26 +1326,21 @@ async def admin_sub_action(sub_id: int, body: SubActionRequest, user=Depends(get
 
 @app.get("/api/admin/stats")
 async def admin_stats(user=Depends(get_admin_user)):
-    return db.get_admin_stats()
+    return await asyncio.to_thread(db.get_admin_stats)
 
 
 @app.get("/api/admin/users")
 async def admin_users(q: str = "", user=Depends(get_admin_user)):
-    if not q:
-        users = db.search_users("", limit=20)
-    else:
-        users = db.search_users(q, limit=20)
+    users = await asyncio.to_thread(db.search_users, q, 20)
     return {"users": users}
 
 
 class TariffUpdate(BaseModel):
-    tariff: str = "free"
+    tariff: Literal["free", "gold"] = "free"
 
 @app.put("/api/admin/users/{target_id}/tariff")
 async def admin_update_tariff(target_id: int, body: TariffUpdate, user=Depends(get_admin_user)):
-    if body.tariff not in ("free", "gold"):
-        raise HTTPException(400, "Invalid tariff")
-    db.update_user_tariff(target_id, body.tariff)
+    await asyncio.to_thread(db.update_user_tariff, target_id, body.tariff)
     return {"success": True, "user_id": target_id, "tariff": body.tariff}
 
 
@@ -1000,8 +1348,8 @@ async def admin_update_tariff(target_id: int, body: TariffUpdate, user=Depends(g
 
 @app.get("/api/referral")
 async def get_referral(user=Depends(get_current_user)):
-    code = db.generate_referral_code(user["user_id"])
-    stats = db.get_referral_stats(user["user_id"])
+    code = await asyncio.to_thread(db.generate_referral_code, user["user_id"])
+    stats = await asyncio.to_thread(db.get_referral_stats, user["user_id"])
     return {
         "code": code,
         "referral_count": stats["referral_count"],
@@ -1014,7 +1362,7 @@ class ReferralApply(BaseModel):
 
 @app.post("/api/referral/apply")
 async def apply_referral(body: ReferralApply, user=Depends(get_current_user)):
-    result = db.process_referral(user["user_id"], body.code.strip().upper())
+    result = await asyncio.to_thread(db.process_referral, user["user_id"], body.code.strip().upper())
     if "error" in result:
         raise HTTPException(400, result["error"])
     return {"success": True, "message": "Referral applied! You got +1 bonus mock test."}
@@ -1022,6 +1370,21 @@ async def apply_referral(body: ReferralApply, user=Depends(get_current_user)):
 
 # ─── Channel Subscription Check ──────────────────────────────
 
+@app.on_event("startup")
+async def _open_http_session():
+    # One pooled session for outbound Telegram API calls — a per-request
+    # ClientSession pays the full TCP+TLS handshake every time
+    app.state.http = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=30),
+        connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+    )
+
+
+@app.on_event("shutdown")
+async def _close_http_session():
+    await app.state.http.close()
+
+
 @app.get("/api/check-subscription")
 async def check_subscription(user=Depends(get_current_user)):
     """Check if the user is subscribed to the required Telegram channel."""
@@ -1030,28 +1393,25 @@ async def check_subscription(user=Depends(get_current_user)):
     params = {"chat_id": CHANNEL_USERNAME, "user_id": user_id}
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as resp:
-                data = await resp.json()
+        async with app.state.http.get(url, params=params) as resp:
+            data = await resp.json()
 
         if data.get("ok"):
             status = data["result"]["status"]
             subscribed = status in ("member", "administrator", "creator")
         else:
             # If bot can't check (not admin in channel, etc.), assume not subscribed
-            logger.warning(f"Subscription check failed for {user_id}: {data}")
+            logger.warning("Subscription check failed for %s: %s", user_id, data)
             subscribed = False
     except Exception as e:
-        logger.error(f"Subscription check error for {user_id}: {e}")
+        logger.error("Subscription check error for %s: %s", user_id, e)
         subscribed = False
 
     channel_url = f"https://t.me/{CHANNEL_USERNAME.lstrip('@')}"
     return {"subscribed": subscribed, "channel_url": channel_url}
 
 
-@app.get("/api/content/tips")
-async def get_tips(user=Depends(get_current_user)):
-    return {
+TIPS = {
         "tips": [
             {"title": "Part 1.1: Interview", "content": "Answer in 2-3 sentences. Be yourself and speak naturally. Each question has 30 seconds.", "icon": "chat"},
             {"title": "Part 1.2: Pictures", "content": "Describe what you see clearly. Compare the images and give your opinion. 30 seconds per question.", "icon": "image"},
@@ -1061,51 +1421,108 @@ async def get_tips(user=Depends(get_current_user)):
             {"title": "Grammar: Mix it Up", "content": "Use a range of structures: conditionals, passive voice, relative clauses. Accuracy matters more than complexity.", "icon": "check"},
         ]
     }
+_TIPS_BYTES = orjson.dumps(TIPS)
+# Compressed once at import too, so tips hits skip the gzip middleware CPU
+_TIPS_GZIP = gzip.compress(_TIPS_BYTES, 6)
+_TIPS_ETAG = '"' + hashlib.blake2b(_TIPS_BYTES, digest_size=16).hexdigest() + '"'
+
+
+@app.get("/api/content/tips")
+def get_tips(request: Request):
+    # Serialized once at import — the handler just returns the cached
+    # bytes. No auth: the payload is the same static study advice for
+    # everyone, so requiring initData only added HMAC work per call.
+    if request.headers.get("if-none-match") == _TIPS_ETAG:
+        return Response(status_code=304)
+    headers = {"ETag": _TIPS_ETAG, "Cache-Control": "public, max-age=86400"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+        return Response(content=_TIPS_GZIP, media_type="application/json", headers=headers)
+    return Response(content=_TIPS_BYTES, media_type="application/json", headers=headers)
 
 
 # ─── TTS (ElevenLabs) ─────────────────────────────────────────
 
 class TTSRequest(BaseModel):
     text: str
-    voice: str = "sarah"
+    # Literal so pydantic rejects unknown voices at parse time, before the
+    # handler spends an edge-tts attempt on them
+    voice: Literal["sarah", "lily", "charlie", "roger"] = "sarah"
 
 @app.post("/api/tts")
 async def text_to_speech(body: TTSRequest, user=Depends(get_current_user)):
-    import edge_tts
-
     if len(body.text) > 500:
         raise HTTPException(400, "Text too long")
 
-    voice = EDGE_TTS_VOICES.get(body.voice, EDGE_TTS_VOICES["sarah"])
+    voice = EDGE_TTS_VOICES[body.voice]
+
+    communicate = edge_tts.Communicate(body.text, voice)
+    stream = communicate.stream()
 
+    # Pull the first audio chunk eagerly so synthesis failures still
+    # surface as a 502 instead of a broken response body
     try:
-        communicate = edge_tts.Communicate(body.text, voice)
-        audio_chunks = []
-        async for chunk in communicate.stream():
+        first = None
+        async for chunk in stream:
             if chunk["type"] == "audio":
-                audio_chunks.append(chunk["data"])
-
-        if not audio_chunks:
+                first = chunk["data"]
+                break
+        if first is None:
             raise HTTPException(502, "TTS generation failed")
-
-        audio_data = b"".join(audio_chunks)
-        return Response(content=audio_data, media_type="audio/mpeg")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Edge TTS error: {e}")
+        logger.error("Edge TTS error: %s", e)
         raise HTTPException(502, "TTS service unavailable")
 
+    async def gen():
+        yield first
+        try:
+            async for chunk in stream:
+                if chunk["type"] == "audio":
+                    yield chunk["data"]
+        except Exception as e:
+            logger.error("Edge TTS stream error: %s", e)
+
+    # Chunks go out as edge-tts produces them: first byte after the first
+    # chunk instead of after full synthesis, and only one chunk in memory.
+    # Explicit identity encoding keeps GZipMiddleware from re-compressing
+    # MP3 bytes that won't shrink.
+    return StreamingResponse(
+        gen(),
+        media_type="audio/mpeg",
+        headers={"Content-Disposition": "inline", "Content-Encoding": "identity"},
+    )
+
 
 # ─── Static files (frontend) ──────────────────────────────────
 
-# Serve webapp folder
+# Serve webapp folder. SERVE_STATIC=0 drops the whole block (including the
+# catch-all mount) for deployments where nginx serves the bundles from disk,
+# so static requests never reach the Python worker at all.
 webapp_dir = os.path.join(os.path.dirname(__file__), "webapp")
-if os.path.isdir(webapp_dir):
-    app.mount("/css", StaticFiles(directory=os.path.join(webapp_dir, "css")), name="css")
-    app.mount("/js", StaticFiles(directory=os.path.join(webapp_dir, "js")), name="js")
+if os.path.isdir(webapp_dir) and os.getenv("SERVE_STATIC", "1") != "0":
+    # index.html is read once at import — no disk I/O on the hot root path.
+    # no-cache keeps Telegram's webview revalidating after deploys.
+    with open(os.path.join(webapp_dir, "index.html"), "rb") as _f:
+        _INDEX_BYTES = _f.read()
+
+    @app.middleware("http")
+    async def _static_cache_control(request, call_next):
+        response = await call_next(request)
+        # Filenames aren't content-hashed, so cap at an hour rather than
+        # the usual year+immutable
+        if request.url.path.startswith(("/css/", "/js/")):
+            response.headers.setdefault("Cache-Control", "public, max-age=3600")
+        return response
 
     @app.get("/")
     async def serve_index():
-        return FileResponse(os.path.join(webapp_dir, "index.html"))
+        return Response(
+            content=_INDEX_BYTES,
+            media_type="text/html",
+            headers={"Cache-Control": "no-cache"},
+        )
 
     @app.get("/privacy")
     @app.get("/privacy.html")
@@ -1114,3 +1531,7 @@ if os.path.isdir(webapp_dir):
             os.path.join(webapp_dir, "privacy.html"),
             media_type="text/html",
         )
+
+    # One mount for everything under webapp/ (css, js, html). Registered
+    # after the API routes so it only sees paths nothing else claimed.
+    app.mount("/", StaticFiles(directory=webapp_dir, html=True), name="webapp")